@@ -1,9 +1,14 @@
 import streamlit as st
+import pandas as pd
 from owlready2 import *
 from pathlib import Path
+import functools
 import logging
+import random
+import re
 import shutil
-from typing import List, Dict, Set
+from types import SimpleNamespace
+from typing import List, Dict, Optional, Set, Tuple
 
 # -------------------------------------------------
 # Basic setup
@@ -17,34 +22,110 @@ st.set_page_config(page_title="Financial Analysis ITS", layout="wide")
 ONTO_FILENAME = "financial_analysis_enhanced.owl"
 ONTO_PATH = Path(__file__).resolve().parent / ONTO_FILENAME
 
-try:
-    onto_path.append(str(ONTO_PATH.parent))
-    onto = get_ontology(str(ONTO_PATH)).load()
-except Exception as e:
-    st.error(f"Failed to load ontology: {e}")
-    onto = None
 
-# Optional reasoning (quiet)
-if onto:
-    try:
-        if shutil.which("java"):
-            try:
-                sync_reasoner_pellet(
-                    infer_property_values=True,
-                    infer_data_property_values=True
-                )
-                logging.info("Pellet reasoning completed.")
-            except Exception as e:
-                logging.warning(f"Pellet reasoning failed: {e}. Continuing without reasoning.")
-    except Exception as ex:
-        logging.warning(f"Reasoning error: {ex}")
+@st.cache_resource
+def load_onto(path: Path):
+    """Load the ontology once per process and index its concepts.
+
+    Streamlit re-runs this script on every interaction, so anything derived
+    purely from the ontology is computed here instead of at module level.
+    """
+    onto_path.append(str(path.parent))
+    # A private World keeps this app's quadstore and entity cache apart from
+    # owlready2's global default_world.
+    world = World()
+    onto = world.get_ontology(str(path)).load()
+
+    # Optional reasoning (quiet). Runs before indexing so inferred types and
+    # property values are picked up.
+    if shutil.which("java"):
+        try:
+            sync_reasoner_pellet(
+                world,
+                infer_property_values=True,
+                infer_data_property_values=True
+            )
+            logging.info("Pellet reasoning completed.")
+        except Exception as e:
+            logging.warning(f"Pellet reasoning failed: {e}. Continuing without reasoning.")
+
+    all_concepts = [c for c in onto.individuals() if is_concept(c)]
+    groups, concept_to_module = group_concepts(all_concepts)
+
+    quizzes_by_concept = {c.name: get_related(c, "hasQuiz") for c in all_concepts}
+    practices_by_concept = {c.name: get_related(c, "hasPractice") for c in all_concepts}
+    cases_by_concept = {c.name: get_related(c, "hasCaseStudy") for c in all_concepts}
+    quizzes = [q for qs in quizzes_by_concept.values() for q in qs]
+    resources = [r for rs in (*practices_by_concept.values(), *cases_by_concept.values()) for r in rs]
+
+    literals: Dict[str, Dict[str, object]] = {
+        p: {} for p in CONCEPT_LITERALS + QUIZ_LITERALS + RESOURCE_LITERALS
+    }
+    for props, entities in (
+        (CONCEPT_LITERALS, all_concepts),
+        (QUIZ_LITERALS, quizzes),
+        (RESOURCE_LITERALS, resources),
+    ):
+        for e in entities:
+            for p in props:
+                literals[p][e.name] = _first_literal(e, p)
+
+    level_by_concept = {n: lvl or "Unspecified" for n, lvl in literals["hasLevel"].items()}
+    choices_by_quiz = {n: [o.strip() for o in (opts or "").split("|")] for n, opts in literals["options"].items()}
+    correct_by_quiz = {n: (ans or "").strip() for n, ans in literals["correctAnswer"].items()}
+    quiz_names_by_concept = {n: [q.name for q in qs] for n, qs in quizzes_by_concept.items()}
+    related_by_concept = {c.name: [r.name for r in get_related(c, "relatedTo")] for c in all_concepts}
+    display_by_name = {c.name: concept_display_name(c.name) for c in all_concepts}
+    calc_key_by_concept = {c.name: calculator_key(c.name) for c in all_concepts}
+    quiz_concepts = [c for c in all_concepts if quizzes_by_concept[c.name]]
+
+    quiz_pool = [(n, q.name) for n, qs in quizzes_by_concept.items() for q in qs]
+    # difficulty -> indices into quiz_pool, so a drawn index stays valid across filters
+    quiz_pool_by_difficulty: Dict[str, List[int]] = {"All Levels": list(range(len(quiz_pool)))}
+    for i, (_, quiz_name) in enumerate(quiz_pool):
+        difficulty = literals["difficulty"].get(quiz_name)
+        if difficulty:
+            quiz_pool_by_difficulty.setdefault(difficulty.strip(), []).append(i)
+
+    return SimpleNamespace(
+        onto=onto,
+        all_concepts=all_concepts,
+        by_name={c.name: c for c in all_concepts},
+        groups=groups,
+        module_names=tuple(groups),
+        # display label -> concept, ready to feed the topic selectboxes
+        display_map_by_module={m: {display_by_name[c.name]: c for c in cs} for m, cs in groups.items()},
+        quiz_display_map={display_by_name[c.name]: c for c in quiz_concepts},
+        concept_to_module=concept_to_module,
+        quiz_concepts=quiz_concepts,
+        quiz_concept_names=frozenset(n for n, qs in quizzes_by_concept.items() if qs),
+        quizzes_by_concept=quizzes_by_concept,
+        practices_by_concept=practices_by_concept,
+        cases_by_concept=cases_by_concept,
+        literals=literals,
+        choices_by_quiz=choices_by_quiz,
+        correct_by_quiz=correct_by_quiz,
+        level_by_concept=level_by_concept,
+        quiz_names_by_concept=quiz_names_by_concept,
+        quiz_by_name={q.name: q for q in quizzes},
+        quiz_pool=quiz_pool,
+        quiz_pool_by_difficulty=quiz_pool_by_difficulty,
+        related_by_concept=related_by_concept,
+        display_by_name=display_by_name,
+        calc_key_by_concept=calc_key_by_concept,
+    )
 
 
 # -------------------------------------------------
 # Helper Functions
 # -------------------------------------------------
-def get_literal(entity, prop_name: str):
-    """Return first literal for a given data property on an individual, or None."""
+CONCEPT_LITERALS = ("hasDefinition", "hasTheory", "hasExample", "hasLevel")
+QUIZ_LITERALS = ("questionText", "options", "correctAnswer", "difficulty")
+RESOURCE_LITERALS = ("title", "description")  # PracticeExercise / CaseStudy
+
+
+def _first_literal(entity, prop_name: str):
+    """Read the first literal of a data property straight from the ontology, or None."""
     try:
         vals = getattr(entity, prop_name)
         if vals:
@@ -54,6 +135,14 @@ def get_literal(entity, prop_name: str):
     return None
 
 
+def get_literal(entity, prop_name: str):
+    """Return first literal for a given data property on an individual, or None."""
+    preloaded = kb.literals.get(prop_name)
+    if preloaded is not None and entity.name in preloaded:
+        return preloaded[entity.name]
+    return _first_literal(entity, prop_name)
+
+
 def is_concept(individual) -> bool:
     """Check if an individual is an instance of the Concept class."""
     try:
@@ -62,12 +151,6 @@ def is_concept(individual) -> bool:
         return False
 
 
-def list_concepts() -> List:
-    if not onto:
-        return []
-    return [c for c in onto.individuals() if is_concept(c)]
-
-
 def get_related(entity, prop: str) -> List:
     try:
         return list(getattr(entity, prop))
@@ -76,64 +159,61 @@ def get_related(entity, prop: str) -> List:
 
 
 def get_practices(entity) -> List:
-    return get_related(entity, "hasPractice")
+    return kb.practices_by_concept.get(entity.name, [])
 
 
 def get_cases(entity) -> List:
-    return get_related(entity, "hasCaseStudy")
+    return kb.cases_by_concept.get(entity.name, [])
 
 
 def get_quizzes(entity) -> List:
-    return get_related(entity, "hasQuiz")
+    return kb.quizzes_by_concept.get(entity.name, [])
+
 
+_CAMEL_RE = re.compile(r"(?<=[^A-Z])(?=[A-Z])")
 
-def concept_display_name(ind) -> str:
+
+@functools.lru_cache(maxsize=4096)
+def concept_display_name(name: str) -> str:
     """Convert CamelCase to 'Camel Case' for nicer UI labels."""
-    name = ind.name
-    out = ""
-    for i, ch in enumerate(name):
-        if i > 0 and ch.isupper() and not name[i - 1].isupper():
-            out += " "
-        out += ch
-    return out
+    return _CAMEL_RE.sub(" ", name)
 
 
 def get_level(entity) -> str:
-    level = get_literal(entity, "hasLevel")
-    return level if level else "Unspecified"
-
-
-def group_concepts(concepts: List) -> Dict[str, List]:
-    """Group concepts roughly into curriculum modules using their names."""
-    groups: Dict[str, List] = {
-        "Foundations: Financial Statements": [],
-        "Profitability & Return Ratios": [],
-        "Liquidity & Working Capital": [],
-        "Asset Utilisation & Efficiency": [],
-        "Leverage & Capital Structure": [],
-        "Trend, Growth & Benchmarking": [],
-        "Pyramid / DuPont Analysis": [],
-        "Other Concepts": [],
-    }
+    return kb.level_by_concept.get(entity.name, "Unspecified")
+
+
+_GROUP_PATTERNS = [
+    (group_name, re.compile("|".join(map(re.escape, keywords))))
+    for group_name, keywords in [
+        ("Foundations: Financial Statements", ["financialstatements", "balancesheet", "incomestatement", "cashflow"]),
+        ("Profitability & Return Ratios", ["profitability", "returnon", "returnratios"]),
+        ("Liquidity & Working Capital", ["liquidity", "currentratio", "quickratio", "workingcapital"]),
+        ("Asset Utilisation & Efficiency", ["assetutilization", "assetutilisation"]),
+        ("Leverage & Capital Structure", ["leverage", "debttoequity"]),
+        ("Trend, Growth & Benchmarking", ["trendanalysis", "growthratios", "benchmarking"]),
+        ("Pyramid / DuPont Analysis", ["dupont"]),
+    ]
+]
+
+
+def group_concepts(concepts: List) -> Tuple[Dict[str, List], Dict]:
+    """Group concepts roughly into curriculum modules using their names.
+
+    Also returns a reverse index mapping each concept to its module name.
+    """
+    groups: Dict[str, List] = {group_name: [] for group_name, _ in _GROUP_PATTERNS}
+    groups["Other Concepts"] = []
     for c in concepts:
         n = c.name.lower()
-        if any(k in n for k in ["financialstatements", "balancesheet", "incomestatement", "cashflow"]):
-            groups["Foundations: Financial Statements"].append(c)
-        elif any(k in n for k in ["profitability", "returnon", "returnratios"]):
-            groups["Profitability & Return Ratios"].append(c)
-        elif any(k in n for k in ["liquidity", "currentratio", "quickratio", "workingcapital"]):
-            groups["Liquidity & Working Capital"].append(c)
-        elif any(k in n for k in ["assetutilization", "assetutilisation"]):
-            groups["Asset Utilisation & Efficiency"].append(c)
-        elif any(k in n for k in ["leverage", "debttoequity"]):
-            groups["Leverage & Capital Structure"].append(c)
-        elif any(k in n for k in ["trendanalysis", "growthratios", "benchmarking"]):
-            groups["Trend, Growth & Benchmarking"].append(c)
-        elif any(k in n for k in ["dupont"]):
-            groups["Pyramid / DuPont Analysis"].append(c)
+        for group_name, pattern in _GROUP_PATTERNS:
+            if pattern.search(n):
+                groups[group_name].append(c)
+                break
         else:
             groups["Other Concepts"].append(c)
-    return groups
+    concept_to_module = {c: m for m, cs in groups.items() for c in cs}
+    return groups, concept_to_module
 
 
 # -------------------------------------------------
@@ -148,31 +228,38 @@ if "visited_concepts" not in st.session_state:
 if "last_concept" not in st.session_state:
     st.session_state["last_concept"] = None
 
+if "quiz_rng" not in st.session_state:
+    # Per-session generator so draws don't share the process-wide random state
+    st.session_state["quiz_rng"] = random.Random()
+
+# Names of concepts with at least one correctly answered quiz; rebuilt by
+# refresh_mastery() at the start of each run and whenever a result changes.
+mastered_concepts: Set[str] = set()
+
+
+def refresh_mastery():
+    global mastered_concepts
+    correct_set = {q for q, ok in st.session_state["quiz_correct"].items() if ok}
+    mastered_concepts = {
+        name for name, qs in kb.quiz_names_by_concept.items() if correct_set.intersection(qs)
+    }
+
 
 def mark_quiz_result(quiz_name: str, is_correct: bool):
     st.session_state["quiz_correct"][quiz_name] = is_correct
+    refresh_mastery()
 
 
 def concept_mastered(concept) -> bool:
-    qs = get_quizzes(concept)
-    if not qs:
-        return False
-    return any(st.session_state["quiz_correct"].get(q.name, False) for q in qs)
+    return concept.name in mastered_concepts
 
 
-def compute_progress(concepts: List) -> float:
-    """% of concepts that have at least one quiz answered correctly."""
-    with_quiz = [c for c in concepts if get_quizzes(c)]
+def compute_progress(names: Optional[Set[str]] = None) -> float:
+    """% of quiz-enabled concepts (optionally only those in names) with a quiz answered correctly."""
+    with_quiz = kb.quiz_concept_names if names is None else kb.quiz_concept_names & names
     if not with_quiz:
         return 0.0
-    mastered = [c for c in with_quiz if concept_mastered(c)]
-    return 100.0 * len(mastered) / len(with_quiz)
-
-
-def module_progress(module_concepts: List) -> float:
-    if not module_concepts:
-        return 0.0
-    return compute_progress(module_concepts)
+    return 100.0 * len(mastered_concepts & with_quiz) / len(with_quiz)
 
 
 # -------------------------------------------------
@@ -181,116 +268,166 @@ def module_progress(module_concepts: List) -> float:
 def recommend_next(concepts: List, groups: Dict[str, List], k: int = 5) -> List:
     visited: Set[str] = set(st.session_state["visited_concepts"])  # type: ignore
 
-    # 1) Prefer unvisited Beginner concepts
-    beginner_candidates = [
-        c for c in concepts
-        if c.name not in visited and get_level(c).lower().startswith("beginner")
-    ]
+    def candidates():
+        # 1) Prefer unvisited Beginner concepts
+        for c in concepts:
+            if c.name not in visited and get_level(c).lower().startswith("beginner"):
+                yield c.name
 
-    # 2) Then concepts related to mastered ones
-    mastered = [c for c in concepts if concept_mastered(c)]
-    related_candidates = []
-    for m in mastered:
-        for r in get_related(m, "relatedTo"):
-            if r not in related_candidates and not concept_mastered(r):
-                related_candidates.append(r)
+        # 2) Then concepts related to mastered ones
+        for c in concepts:
+            if c.name in mastered_concepts:
+                for r in kb.related_by_concept.get(c.name, []):
+                    if r not in mastered_concepts:
+                        yield r
 
-    recs: List = []
-    for c in beginner_candidates:
-        if c not in recs:
-            recs.append(c)
-        if len(recs) >= k:
-            break
+        # 3) Fill with any unmastered
+        for c in concepts:
+            if c.name not in mastered_concepts:
+                yield c.name
 
-    for c in related_candidates:
-        if c not in recs:
-            recs.append(c)
+    seen: Set[str] = set()
+    recs: List = []
+    for name in candidates():
+        if name in seen or name not in by_name:
+            continue
+        seen.add(name)
+        recs.append(by_name[name])
         if len(recs) >= k:
             break
+    return recs
 
-    # 3) Fill with any unmastered
-    if len(recs) < k:
-        for c in concepts:
-            if c not in recs and not concept_mastered(c):
-                recs.append(c)
-            if len(recs) >= k:
-                break
 
-    return recs[:k]
+def recommendations_frame(recs: List) -> pd.DataFrame:
+    """Tabulate recommended concepts for display as a single dataframe."""
+    return pd.DataFrame([
+        {
+            "Topic": concept_display_name(c.name),
+            "Module": concept_to_module.get(c, "Curriculum"),
+            "Level": get_level(c),
+            "Status": "Mastered ✅" if concept_mastered(c) else "Not Mastered",
+        }
+        for c in recs
+    ])
 
 
 # -------------------------------------------------
 # Calculators
 # -------------------------------------------------
-def show_ratio_calculator(concept):
-    name = concept.name.lower()
-    st.markdown("### 🔢 Interactive Calculator")
+_CALC_KEYWORDS = [
+    ("currentratio", ["currentratio"]),
+    ("quickratio", ["quickratio"]),
+    ("returnonequity", ["returnonequity", "return_on_equity", "roe"]),
+    ("returnonassets", ["returnonassets", "return_on_assets", "roa"]),
+    ("debttoequity", ["debttoequity"]),
+]
+
 
-    if "currentratio" in name:
+def calculator_key(name: str) -> Optional[str]:
+    """Return the calculator key for a concept name, or None if it has no calculator."""
+    n = name.lower()
+    return next((key for key, kws in _CALC_KEYWORDS if any(k in n for k in kws)), None)
+
+
+def _calc_current_ratio():
+    """Current ratio: current assets over current liabilities."""
+    with st.form("calc_current_ratio"):
         ca = st.number_input("Current Assets (₦)", min_value=0.0, step=1000.0, key="ca")
         cl = st.number_input("Current Liabilities (₦)", min_value=0.0, step=1000.0, key="cl")
-        if cl > 0:
-            ratio = ca / cl
-            st.write(f"**Current Ratio = {ratio:.2f}x**")
-            if ratio < 1:
-                st.warning("Current ratio < 1 may indicate liquidity stress.")
-            elif ratio < 1.5:
-                st.info("Current ratio is modest. Many analysts prefer ≥ 1.5× depending on industry.")
+        if st.form_submit_button("Compute"):
+            if cl > 0:
+                ratio = ca / cl
+                st.write(f"**Current Ratio = {ratio:.2f}x**")
+                if ratio < 1:
+                    st.warning("Current ratio < 1 may indicate liquidity stress.")
+                elif ratio < 1.5:
+                    st.info("Current ratio is modest. Many analysts prefer ≥ 1.5× depending on industry.")
+                else:
+                    st.success("Comfortable liquidity, but examine quality of current assets as well.")
             else:
-                st.success("Comfortable liquidity, but examine quality of current assets as well.")
-        else:
-            st.info("Enter a positive value for current liabilities to compute the ratio.")
+                st.info("Enter a positive value for current liabilities to compute the ratio.")
 
-    elif "quickratio" in name:
+
+def _calc_quick_ratio():
+    """Quick ratio: cash, securities and receivables over current liabilities."""
+    with st.form("calc_quick_ratio"):
         cash = st.number_input("Cash (₦)", min_value=0.0, step=1000.0, key="cash")
         sec = st.number_input("Marketable Securities (₦)", min_value=0.0, step=1000.0, key="sec")
         rec = st.number_input("Accounts Receivable (₦)", min_value=0.0, step=1000.0, key="rec")
         cl = st.number_input("Current Liabilities (₦)", min_value=0.0, step=1000.0, key="cl_q")
-        if cl > 0:
-            quick_assets = cash + sec + rec
-            ratio = quick_assets / cl
-            st.write(f"**Quick Ratio = {ratio:.2f}x**")
-            if ratio < 1:
-                st.warning("Quick ratio < 1 suggests reliance on inventory or refinancing.")
+        if st.form_submit_button("Compute"):
+            if cl > 0:
+                quick_assets = cash + sec + rec
+                ratio = quick_assets / cl
+                st.write(f"**Quick Ratio = {ratio:.2f}x**")
+                if ratio < 1:
+                    st.warning("Quick ratio < 1 suggests reliance on inventory or refinancing.")
+                else:
+                    st.success("Quick ratio ≥ 1 suggests strong coverage by liquid assets.")
             else:
-                st.success("Quick ratio ≥ 1 suggests strong coverage by liquid assets.")
-        else:
-            st.info("Enter a positive value for current liabilities to compute the ratio.")
+                st.info("Enter a positive value for current liabilities to compute the ratio.")
 
-    elif "returnonequity" in name or "return_on_equity" in name or "roe" in name:
+
+def _calc_roe():
+    """Return on equity: net income over average equity."""
+    with st.form("calc_roe"):
         ni = st.number_input("Net Income (₦)", min_value=0.0, step=1000.0, key="ni_roe")
         beg_eq = st.number_input("Beginning Equity (₦)", min_value=0.0, step=1000.0, key="beg_eq")
         end_eq = st.number_input("Ending Equity (₦)", min_value=0.0, step=1000.0, key="end_eq")
-        avg_eq = (beg_eq + end_eq) / 2 if (beg_eq + end_eq) > 0 else 0
-        if avg_eq > 0:
-            roe = ni / avg_eq * 100
-            st.write(f"**ROE = {roe:.1f}%**")
-            st.info("Compare ROE with the firm's cost of equity and industry peers.")
-        else:
-            st.info("Enter positive beginning and ending equity values to compute ROE.")
+        if st.form_submit_button("Compute"):
+            avg_eq = (beg_eq + end_eq) / 2 if (beg_eq + end_eq) > 0 else 0
+            if avg_eq > 0:
+                roe = ni / avg_eq * 100
+                st.write(f"**ROE = {roe:.1f}%**")
+                st.info("Compare ROE with the firm's cost of equity and industry peers.")
+            else:
+                st.info("Enter positive beginning and ending equity values to compute ROE.")
 
-    elif "returnonassets" in name or "return_on_assets" in name or "roa" in name:
+
+def _calc_roa():
+    """Return on assets: net income over average total assets."""
+    with st.form("calc_roa"):
         ni = st.number_input("Net Income (₦)", min_value=0.0, step=1000.0, key="ni_roa")
         beg_a = st.number_input("Beginning Total Assets (₦)", min_value=0.0, step=1000.0, key="beg_a")
         end_a = st.number_input("Ending Total Assets (₦)", min_value=0.0, step=1000.0, key="end_a")
-        avg_a = (beg_a + end_a) / 2 if (beg_a + end_a) > 0 else 0
-        if avg_a > 0:
-            roa = ni / avg_a * 100
-            st.write(f"**ROA = {roa:.1f}%**")
-            st.info("Use ROA to compare asset efficiency across firms or over time.")
-        else:
-            st.info("Enter positive beginning and ending asset values to compute ROA.")
+        if st.form_submit_button("Compute"):
+            avg_a = (beg_a + end_a) / 2 if (beg_a + end_a) > 0 else 0
+            if avg_a > 0:
+                roa = ni / avg_a * 100
+                st.write(f"**ROA = {roa:.1f}%**")
+                st.info("Use ROA to compare asset efficiency across firms or over time.")
+            else:
+                st.info("Enter positive beginning and ending asset values to compute ROA.")
 
-    elif "debttoequity" in name:
+
+def _calc_debt_to_equity():
+    """Debt-to-equity: total debt over total equity."""
+    with st.form("calc_debt_to_equity"):
         debt = st.number_input("Total Debt (₦)", min_value=0.0, step=1000.0, key="debt")
         eq = st.number_input("Total Equity (₦)", min_value=0.0, step=1000.0, key="eq")
-        if eq > 0:
-            de = debt / eq
-            st.write(f"**Debt-to-Equity = {de:.2f}x**")
-            st.info("Higher leverage can amplify returns but also raises financial risk.")
-        else:
-            st.info("Enter a positive equity value to compute the ratio.")
+        if st.form_submit_button("Compute"):
+            if eq > 0:
+                de = debt / eq
+                st.write(f"**Debt-to-Equity = {de:.2f}x**")
+                st.info("Higher leverage can amplify returns but also raises financial risk.")
+            else:
+                st.info("Enter a positive equity value to compute the ratio.")
+
 
+_CALC_DISPATCH = {
+    "currentratio": _calc_current_ratio,
+    "quickratio": _calc_quick_ratio,
+    "returnonequity": _calc_roe,
+    "returnonassets": _calc_roa,
+    "debttoequity": _calc_debt_to_equity,
+}
+
+
+def show_ratio_calculator(concept):
+    st.markdown("### 🔢 Interactive Calculator")
+    handler = _CALC_DISPATCH.get(kb.calc_key_by_concept.get(concept.name))
+    if handler:
+        handler()
     else:
         st.write("No dedicated calculator for this concept yet. Apply formulas from the theory section manually.")
 
@@ -298,17 +435,29 @@ def show_ratio_calculator(concept):
 # -------------------------------------------------
 # Guard: Ontology must load
 # -------------------------------------------------
-if not onto:
+try:
+    kb = load_onto(ONTO_PATH)
+except Exception as e:
+    st.error(f"Failed to load ontology: {e}")
+    kb = None
+
+if not kb:
     st.error("Ontology failed to load. Ensure 'financial_analysis_enhanced.owl' is in the same folder as this app.")
     st.stop()
 
-all_concepts = list_concepts()
+onto = kb.onto
+all_concepts = kb.all_concepts
+by_name = kb.by_name
+groups = kb.groups
+concept_to_module = kb.concept_to_module
+quiz_concepts = kb.quiz_concepts
+display_by_name = kb.display_by_name
+refresh_mastery()
+
 if not all_concepts:
     st.error("No Concept individuals found in the ontology.")
     st.stop()
 
-groups = group_concepts(all_concepts)
-
 # -------------------------------------------------
 # Sidebar Navigation
 # -------------------------------------------------
@@ -319,7 +468,7 @@ page = st.sidebar.radio(
 )
 
 # Global progress bar at top
-overall_progress = compute_progress(all_concepts)
+overall_progress = compute_progress()
 st.progress(overall_progress / 100.0)
 st.caption(f"Overall learning progress: **{overall_progress:.1f}%** of quiz-enabled topics mastered.")
 
@@ -344,10 +493,9 @@ You will:
     with col1:
         st.metric("Total Concepts", len(all_concepts))
     with col2:
-        quiz_concepts = [c for c in all_concepts if get_quizzes(c)]
         st.metric("Concepts with Quizzes", len(quiz_concepts))
     with col3:
-        st.metric("Mastered Topics", f"{sum(1 for c in quiz_concepts if concept_mastered(c))} / {len(quiz_concepts)}")
+        st.metric("Mastered Topics", f"{len(mastered_concepts & kb.quiz_concept_names)} / {len(quiz_concepts)}")
 
     st.markdown("---")
     st.markdown("### 📌 Your Learning Status")
@@ -357,9 +505,9 @@ You will:
         st.write(f"You have visited **{len(visited)}** topics so far.")
         last_name = st.session_state.get("last_concept")
         if last_name:
-            last_obj = next((c for c in all_concepts if c.name == last_name), None)
+            last_obj = by_name.get(last_name)
             if last_obj:
-                st.info(f"Last topic you studied: **{concept_display_name(last_obj)}**")
+                st.info(f"Last topic you studied: **{concept_display_name(last_obj.name)}**")
     else:
         st.write("You haven't opened any topics yet. Start with the **Learn** page.")
 
@@ -368,11 +516,7 @@ You will:
 
     recs = recommend_next(all_concepts, groups, k=5)
     if recs:
-        for c in recs:
-            lvl = get_level(c)
-            mod = next((m for m, cs in groups.items() if c in cs), "Curriculum")
-            status = "Mastered ✅" if concept_mastered(c) else "Not Mastered"
-            st.markdown(f"- **{concept_display_name(c)}**  \n  _Module_: {mod} | _Level_: {lvl} | _Status_: {status}")
+        st.dataframe(recommendations_frame(recs), hide_index=True)
     else:
         st.write("No recommendations available yet. Try answering some quizzes first.")
 
@@ -394,27 +538,24 @@ elif page == "📚 Learn":
     st.markdown("## 📚 Learn Concepts")
 
     st.sidebar.subheader("Learn: Select Module & Concept")
-    module = st.sidebar.selectbox("Choose a module:", list(groups.keys()))
-    module_concepts = groups.get(module, [])
+    module = st.sidebar.selectbox("Choose a module:", kb.module_names)
+    display_map = kb.display_map_by_module[module]
 
     search = st.sidebar.text_input("Search concept")
     if search:
         s = search.lower()
-        module_concepts = [
-            c for c in module_concepts
-            if s in c.name.lower() or s in concept_display_name(c).lower()
-        ]
+        display_map = {
+            label: c for label, c in display_map.items()
+            if s in c.name.lower() or s in label.lower()
+        }
 
-    if not module_concepts:
+    if not display_map:
         st.warning("No concepts available for this module or search filter.")
         st.stop()
 
-    selected_name = st.sidebar.selectbox(
-        "Choose a topic:",
-        [concept_display_name(c) for c in module_concepts],
-    )
-
-    selected_concept = next(c for c in module_concepts if concept_display_name(c) == selected_name)
+    module_concepts = list(display_map.values())
+    selected_name = st.sidebar.selectbox("Choose a topic:", list(display_map))
+    selected_concept = display_map[selected_name]
 
     # Track last concept & visited set
     st.session_state["last_concept"] = selected_concept.name
@@ -453,21 +594,22 @@ elif page == "📚 Learn":
             st.markdown("---")
             st.subheader("Practice Exercises")
             if practices:
-                for p in practices:
-                    desc = get_literal(p, "description")
-                    st.markdown(f"**📝 {p.name}**")
-                    st.write(desc if desc else "No description for this exercise yet.")
+                st.markdown("\n\n".join(
+                    f"**📝 {p.name}**\n\n"
+                    + (get_literal(p, "description") or "No description for this exercise yet.").strip()
+                    for p in practices
+                ))
             else:
                 st.write("No practice exercises are linked to this concept.")
 
             st.markdown("---")
             st.subheader("Case Studies")
             if cases:
-                for c in cases:
-                    title = get_literal(c, "title") or c.name
-                    desc = get_literal(c, "description")
-                    st.markdown(f"**📊 {title}**")
-                    st.write(desc if desc else "No description available.")
+                st.markdown("\n\n".join(
+                    f"**📊 {get_literal(c, 'title') or c.name}**\n\n"
+                    + (get_literal(c, "description") or "No description available.").strip()
+                    for c in cases
+                ))
             else:
                 st.write("No case studies linked to this concept yet.")
 
@@ -485,16 +627,18 @@ elif page == "📚 Learn":
                         continue
 
                     st.write(q_text)
-                    choices = [o.strip() for o in options.split("|")]
-
-                    user_answer = st.radio(
-                        "Choose your answer:",
-                        choices,
-                        key=f"quiz_{q.name}",
-                    )
-
-                    if st.button("Check answer", key=f"check_{q.name}"):
-                        if user_answer == correct.strip():
+                    choices = kb.choices_by_quiz[q.name]
+
+                    with st.form(f"quiz_form_{q.name}"):
+                        user_answer = st.radio(
+                            "Choose your answer:",
+                            choices,
+                            key=f"quiz_{q.name}",
+                        )
+                        checked = st.form_submit_button("Check answer", key=f"check_{q.name}")
+
+                    if checked:
+                        if user_answer == kb.correct_by_quiz[q.name]:
                             st.success("✅ Correct! Well done.")
                             mark_quiz_result(q.name, True)
                         else:
@@ -505,10 +649,9 @@ elif page == "📚 Learn":
 
     with right_col:
         st.markdown("#### 🔗 Related Concepts")
-        related = get_related(selected_concept, "relatedTo")
+        related = kb.related_by_concept.get(selected_concept.name, [])
         if related:
-            for r in related:
-                st.markdown(f"- {concept_display_name(r)}")
+            st.markdown("\n".join(f"- {concept_display_name(r)}" for r in related))
         else:
             st.write("No explicit related concepts recorded.")
 
@@ -517,7 +660,7 @@ elif page == "📚 Learn":
 
         st.markdown("---")
         st.markdown("#### 🎯 Module Progress")
-        mp = module_progress(module_concepts)
+        mp = compute_progress({c.name for c in module_concepts})
         st.write(f"Module completion: **{mp:.1f}%** (based on quiz performance).")
 
 
@@ -528,7 +671,6 @@ elif page == "🧠 Quiz Hub":
     st.markdown("## 🧠 Quiz Hub")
     st.write("Review and test your knowledge across all concepts that have quizzes.")
 
-    quiz_concepts = [c for c in all_concepts if get_quizzes(c)]
     if not quiz_concepts:
         st.info("No concepts with quizzes are defined yet in the ontology.")
         st.stop()
@@ -536,12 +678,9 @@ elif page == "🧠 Quiz Hub":
     mode = st.radio("Quiz mode:", ["By Topic", "Random Question"])
 
     if mode == "By Topic":
-        topic = st.selectbox(
-            "Choose a topic:",
-            [concept_display_name(c) for c in quiz_concepts],
-        )
-        concept = next(c for c in quiz_concepts if concept_display_name(c) == topic)
-        st.markdown(f"### Topic: {concept_display_name(concept)}")
+        topic = st.selectbox("Choose a topic:", list(kb.quiz_display_map))
+        concept = kb.quiz_display_map[topic]
+        st.markdown(f"### Topic: {topic}")
 
         quizzes = get_quizzes(concept)
         for q in quizzes:
@@ -555,14 +694,16 @@ elif page == "🧠 Quiz Hub":
                 continue
 
             st.write(q_text)
-            choices = [o.strip() for o in options.split("|")]
-            user_answer = st.radio(
-                "Choose your answer:",
-                choices,
-                key=f"qh_{q.name}",
-            )
-            if st.button("Check", key=f"qh_check_{q.name}"):
-                if user_answer == correct.strip():
+            choices = kb.choices_by_quiz[q.name]
+            with st.form(f"qh_form_{q.name}"):
+                user_answer = st.radio(
+                    "Choose your answer:",
+                    choices,
+                    key=f"qh_{q.name}",
+                )
+                checked = st.form_submit_button("Check", key=f"qh_check_{q.name}")
+            if checked:
+                if user_answer == kb.correct_by_quiz[q.name]:
                     st.success("✅ Correct!")
                     mark_quiz_result(q.name, True)
                 else:
@@ -570,23 +711,23 @@ elif page == "🧠 Quiz Hub":
                     mark_quiz_result(q.name, False)
 
     else:  # Random Question
-        import random
-
-        questions = []
-        for c in quiz_concepts:
-            for q in get_quizzes(c):
-                questions.append((c, q))
-
-        if not questions:
+        pool = kb.quiz_pool  # [(concept_name, quiz_name)]
+        if not pool:
             st.info("No quiz questions found.")
             st.stop()
 
-        if st.button("🎲 Draw Random Question"):
-            st.session_state["random_q"] = random.choice(questions)  # type: ignore
+        difficulty = st.selectbox("Difficulty:", list(kb.quiz_pool_by_difficulty))
+        candidates = kb.quiz_pool_by_difficulty[difficulty]
 
-        if "random_q" in st.session_state:
-            concept, q = st.session_state["random_q"]
-            st.markdown(f"### Topic: {concept_display_name(concept)}")
+        if st.button("🎲 Draw Random Question"):
+            rng = st.session_state["quiz_rng"]
+            st.session_state["random_q_idx"] = candidates[rng.randrange(len(candidates))]
+
+        idx = st.session_state.get("random_q_idx")
+        if idx is not None and idx < len(pool):
+            concept_name, quiz_name = pool[idx]
+            concept, q = by_name[concept_name], kb.quiz_by_name[quiz_name]
+            st.markdown(f"### Topic: {concept_display_name(concept.name)}")
             st.markdown(f"#### 🧠 {q.name}")
             q_text = get_literal(q, "questionText")
             options = get_literal(q, "options")
@@ -594,14 +735,16 @@ elif page == "🧠 Quiz Hub":
 
             if q_text and options and correct:
                 st.write(q_text)
-                choices = [o.strip() for o in options.split("|")]
-                user_answer = st.radio(
-                    "Choose your answer:",
-                    choices,
-                    key=f"rand_{q.name}",
-                )
-                if st.button("Check Answer", key=f"rand_check_{q.name}"):
-                    if user_answer == correct.strip():
+                choices = kb.choices_by_quiz[q.name]
+                with st.form(f"rand_form_{q.name}"):
+                    user_answer = st.radio(
+                        "Choose your answer:",
+                        choices,
+                        key=f"rand_{q.name}",
+                    )
+                    checked = st.form_submit_button("Check Answer", key=f"rand_check_{q.name}")
+                if checked:
+                    if user_answer == kb.correct_by_quiz[q.name]:
                         st.success("✅ Correct!")
                         mark_quiz_result(q.name, True)
                     else:
@@ -617,8 +760,7 @@ elif page == "🧠 Quiz Hub":
 elif page == "📈 Progress & Recommendations":
     st.markdown("## 📈 Progress & Recommendations")
 
-    quiz_concepts = [c for c in all_concepts if get_quizzes(c)]
-    mastered = [c for c in quiz_concepts if concept_mastered(c)]
+    mastered = mastered_concepts & kb.quiz_concept_names
     visited = list(st.session_state["visited_concepts"])  # type: ignore
 
     c1, c2, c3 = st.columns(3)
@@ -642,27 +784,20 @@ elif page == "📈 Progress & Recommendations":
                 status = "Mastered ✅"
             rows.append({
                 "Module": m_name,
-                "Topic": concept_display_name(c),
+                "Topic": concept_display_name(c.name),
                 "Level": get_level(c),
                 "Status": status,
             })
 
     st.write("Below is a summary of your status by topic:")
-    st.markdown("| Module | Topic | Level | Status |")
-    st.markdown("|---|---|---|---|")
-    for row in rows:
-        st.markdown(f"| {row['Module']} | {row['Topic']} | {row['Level']} | {row['Status']} |")
+    st.dataframe(pd.DataFrame(rows), hide_index=True)
 
     st.markdown("---")
     st.markdown("### 🎯 Recommended Next Topics")
 
     recs = recommend_next(all_concepts, groups, k=7)
     if recs:
-        for c in recs:
-            mod = next((m for m, cs in groups.items() if c in cs), "Curriculum")
-            lvl = get_level(c)
-            status = "Mastered ✅" if concept_mastered(c) else "Not Mastered"
-            st.markdown(f"- **{concept_display_name(c)}**  \n  _Module_: {mod} | _Level_: {lvl} | _Status_: {status}")
+        st.dataframe(recommendations_frame(recs), hide_index=True)
     else:
         st.write("No recommendations yet. Try completing some quizzes first.")
 